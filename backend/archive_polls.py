@@ -0,0 +1,28 @@
+"""Move stale polls out of the hot `polls` collection (see server.archive_polls).
+
+Meant to be run periodically, e.g. from cron:
+
+    python archive_polls.py --days 90
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+import server
+
+
+async def main(days: int):
+    await server.connect_db()
+    try:
+        archived = await server.archive_polls(datetime.utcnow() - timedelta(days=days))
+        print(f"Archived {archived} polls")
+    finally:
+        server.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive inactive and stale polls")
+    parser.add_argument("--days", type=int, default=server.ARCHIVE_AFTER_DAYS,
+                        help="Archive polls with no activity for this many days")
+    args = parser.parse_args()
+    asyncio.run(main(args.days))
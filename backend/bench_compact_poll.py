@@ -0,0 +1,152 @@
+"""Compare memory and vote throughput of Poll models vs CompactPoll.
+
+Two throughput numbers are reported: applying a vote to an object that is
+already in memory (what a cache holding the object pays), and the full
+decode -> apply -> serialize cycle for one document (what a request pays
+when it has to build the object first). vote_on_poll does neither any
+more; it updates Mongo atomically.
+
+Doesn't need MongoDB; polls are generated in memory.
+
+    python bench_compact_poll.py --polls 20000 --options 4 --voters 50
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+import bson
+
+# server.py reads these at import time; the benchmark never connects
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "bench")
+
+from server import CompactPoll, Poll  # noqa: E402
+
+
+def make_docs(polls: int, options: int, voters: int, user_pool: list) -> list:
+    docs = []
+    for i in range(polls):
+        option_docs = [
+            {"id": str(uuid.uuid4()), "text": f"Option {n}", "votes": 0, "voter_ids": []}
+            for n in range(options)
+        ]
+        for user_id in random.sample(user_pool, voters):
+            option = random.choice(option_docs)
+            option["votes"] += 1
+            option["voter_ids"].append(user_id)
+        docs.append({
+            "id": str(uuid.uuid4()),
+            "title": f"Poll {i}",
+            "description": "Benchmark poll",
+            "options": option_docs,
+            "creator_id": random.choice(user_pool),
+            "creator_username": "bench",
+            "total_votes": voters,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+            "tags": ["bench"],
+            "is_active": True,
+        })
+    return docs
+
+
+def measure_bytes(build, docs: list) -> float:
+    # Decode from BSON inside the measurement so every poll gets its own id
+    # strings, exactly like documents coming back from Mongo
+    raw_docs = [bson.encode(doc) for doc in docs]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [build(bson.decode(raw)) for raw in raw_docs]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del objects
+    return allocated / len(docs)
+
+
+def vote_with_model(poll: Poll, user_id: str, option_id: str):
+    # Same steps vote_on_poll used to take on the Pydantic model
+    for option in poll.options:
+        if user_id in option.voter_ids:
+            return
+    for option in poll.options:
+        if option.id == option_id:
+            option.votes += 1
+            option.voter_ids.append(user_id)
+            break
+    poll.total_votes += 1
+
+
+def vote_with_compact(poll: CompactPoll, user_id: str, option_id: str):
+    # The same steps against the compact layout
+    if user_id in poll.voters:
+        return
+    try:
+        index = poll.option_ids.index(option_id)
+    except ValueError:
+        return
+    poll.votes[index] += 1
+    poll.voters[sys.intern(user_id)] = index
+    poll.total_votes += 1
+
+
+def measure_votes(polls: list, option_ids: list, apply_vote, user_pool: list) -> float:
+    rng = random.Random(42)
+    votes = [(rng.randrange(len(polls)), rng.choice(user_pool)) for _ in range(len(polls) * 5)]
+    start = time.perf_counter()
+    for index, user_id in votes:
+        apply_vote(polls[index], user_id, rng.choice(option_ids[index]))
+    return len(votes) / (time.perf_counter() - start)
+
+
+def measure_cycle(docs: list, option_ids: list, build, apply_vote, serialize, user_pool: list) -> float:
+    rng = random.Random(42)
+    votes = [(rng.randrange(len(docs)), rng.choice(user_pool)) for _ in range(len(docs))]
+    raw_docs = [bson.encode(doc) for doc in docs]
+    start = time.perf_counter()
+    for index, user_id in votes:
+        poll = build(bson.decode(raw_docs[index]))
+        apply_vote(poll, user_id, rng.choice(option_ids[index]))
+        serialize(poll)
+    return len(votes) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polls", type=int, default=20000)
+    parser.add_argument("--options", type=int, default=4)
+    parser.add_argument("--voters", type=int, default=50, help="Existing voters per poll")
+    parser.add_argument("--users", type=int, default=5000, help="Distinct user ids voters are drawn from")
+    args = parser.parse_args()
+
+    random.seed(0)
+    user_pool = [str(uuid.uuid4()) for _ in range(args.users)]
+    docs = make_docs(args.polls, args.options, args.voters, user_pool)
+    option_ids = [[option["id"] for option in doc["options"]] for doc in docs]
+
+    model_bytes = measure_bytes(lambda doc: Poll(**doc), docs)
+    compact_bytes = measure_bytes(CompactPoll.from_doc, docs)
+    model_rate = measure_votes([Poll(**doc) for doc in docs], option_ids, vote_with_model, user_pool)
+    compact_rate = measure_votes([CompactPoll.from_doc(doc) for doc in docs], option_ids, vote_with_compact, user_pool)
+    model_cycle = measure_cycle(docs, option_ids, lambda doc: Poll(**doc), vote_with_model,
+                                lambda poll: poll.dict(), user_pool)
+    compact_cycle = measure_cycle(docs, option_ids, CompactPoll.from_doc, vote_with_compact,
+                                  lambda poll: poll.to_dict(), user_pool)
+
+    print(f"{args.polls} polls, {args.options} options, {args.voters} voters each")
+    print(f"{'':12}{'bytes/poll':>14}{'cached votes/s':>16}{'cycle votes/s':>16}")
+    print(f"{'Poll':12}{model_bytes:>14,.0f}{model_rate:>16,.0f}{model_cycle:>16,.0f}")
+    print(f"{'CompactPoll':12}{compact_bytes:>14,.0f}{compact_rate:>16,.0f}{compact_cycle:>16,.0f}")
+    print(f"{'ratio':12}{model_bytes / compact_bytes:>13.1f}x"
+          f"{compact_rate / model_rate:>15.1f}x{compact_cycle / model_cycle:>15.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Export polls, votes or users as NDJSON or CSV without loading them into memory.
+
+    python export_data.py votes --format csv --output votes.csv
+    python export_data.py polls --include-archived | gzip > polls.ndjson.gz
+"""
+import argparse
+import asyncio
+import sys
+
+import server
+
+
+async def main(dataset: str, export_format: str, include_archived: bool, output: str):
+    await server.connect_db()
+    out = open(output, "wb") if output != "-" else sys.stdout.buffer
+    try:
+        async for chunk in server.encode_export(dataset, export_format, include_archived):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        server.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a dataset out of MongoDB")
+    parser.add_argument("dataset", choices=sorted(server.EXPORTS))
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--include-archived", action="store_true",
+                        help="Also export polls (and their votes) from the archive")
+    parser.add_argument("--output", "-o", default="-", help="File to write (default: stdout)")
+    args = parser.parse_args()
+    asyncio.run(main(args.dataset, args.format, args.include_archived, args.output))
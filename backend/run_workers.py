@@ -0,0 +1,40 @@
+"""Run the API with several uvicorn worker processes.
+
+Each worker keeps its own in-process caches; this launcher gives them a
+shared directory for the Unix-socket invalidation bus in server.py so a
+write handled by one worker evicts the stale entries held by the others.
+Rate-limit buckets are per worker as well, so each RATE_LIMIT_* value
+applies once per worker; scale them down by --workers.
+
+    python run_workers.py --workers 4 --port 8001
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run server:app across multiple worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--invalidation-dir", default=None,
+                        help="Directory for worker sockets (defaults to a fresh temp dir)")
+    args = parser.parse_args()
+
+    invalidation_dir = args.invalidation_dir or tempfile.mkdtemp(prefix="votely-")
+    # Workers are spawned by uvicorn and inherit this environment
+    os.environ["VOTELY_INVALIDATION_DIR"] = invalidation_dir
+    try:
+        uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers,
+                    app_dir=os.path.dirname(os.path.abspath(__file__)))
+    finally:
+        if args.invalidation_dir is None:
+            shutil.rmtree(invalidation_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,235 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, Header, Query
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from urllib.parse import parse_qs
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.monitoring import ConnectionPoolListener
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import json
+import time
+import socket
 import logging
+import threading
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple, NamedTuple, Literal, AsyncIterator
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import hashlib
+import hmac
+from abc import ABC, abstractmethod
+import zlib
+import sys
+import csv
+import io
+from array import array
 from collections import defaultdict
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+def env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+# MongoDB connection settings (tunable per deployment, defaults match the driver's)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+db_name = os.environ['DB_NAME']
+MONGO_MAX_POOL_SIZE = env_int("MONGO_MAX_POOL_SIZE", 100)
+MONGO_MIN_POOL_SIZE = env_int("MONGO_MIN_POOL_SIZE", 0)
+MONGO_MAX_IDLE_TIME_MS = env_int("MONGO_MAX_IDLE_TIME_MS", 0)
+MONGO_CONNECT_TIMEOUT_MS = env_int("MONGO_CONNECT_TIMEOUT_MS", 20000)
+MONGO_SERVER_SELECTION_TIMEOUT_MS = env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000)
+MONGO_SOCKET_TIMEOUT_MS = env_int("MONGO_SOCKET_TIMEOUT_MS", 0)
+MONGO_WAIT_QUEUE_TIMEOUT_MS = env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0)
+MONGO_READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+MONGO_WARMUP_POOL = env_bool("MONGO_WARMUP_POOL", True)
+MONGO_ENSURE_INDEXES = env_bool("MONGO_ENSURE_INDEXES", True)
+
+class PoolMetrics(ConnectionPoolListener):
+    """Connection pool counters fed by pymongo's monitoring events.
+
+    Events are published from the driver's background threads, so every
+    update goes through a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pools = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+
+    def _inc(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def pool_created(self, event):
+        self._inc(pools=1)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._inc(pool_clears=1)
+
+    def pool_closed(self, event):
+        self._inc(pools=-1)
+
+    def connection_created(self, event):
+        self._inc(connections_created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._inc(connections_closed=1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._inc(checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._inc(checked_out=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._inc(checked_out=-1)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            open_connections = self.connections_created - self.connections_closed
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "min_pool_size": MONGO_MIN_POOL_SIZE,
+                "open_connections": open_connections,
+                "checked_out": self.checked_out,
+                "idle": max(open_connections - self.checked_out, 0),
+                "utilization": (self.checked_out / MONGO_MAX_POOL_SIZE) if MONGO_MAX_POOL_SIZE else 0.0,
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+            }
+
+pool_metrics = PoolMetrics()
+
+# The client is created by connect_db() inside the app lifespan (or by scripts
+# that reuse this module), never at import time.
+client: Optional[AsyncIOMotorClient] = None
+db = None
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+        "event_listeners": [pool_metrics],
+    }
+    # 0 means "no limit" for these, which is what the driver does when they are unset
+    if MONGO_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = MONGO_MAX_IDLE_TIME_MS
+    if MONGO_SOCKET_TIMEOUT_MS:
+        options["socketTimeoutMS"] = MONGO_SOCKET_TIMEOUT_MS
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    return AsyncIOMotorClient(mongo_url, **options)
+
+async def ensure_indexes():
+    """Create the indexes the API's queries rely on (no-op if they exist)"""
+    await db.users.create_index([("id", ASCENDING)])
+    await db.users.create_index([("email", ASCENDING)])
+    await db.users.create_index([("xp", DESCENDING)])
+    await db.polls.create_index([("id", ASCENDING)])
+    await db.polls.create_index([("is_active", ASCENDING), ("created_at", DESCENDING)])
+    await db.polls.create_index([("updated_at", ASCENDING), ("id", ASCENDING)])
+    await db.polls.create_index([("pending_jobs.created_at", ASCENDING)])
+    await db.polls_archive.create_index([("id", ASCENDING)], unique=True)
+    await db.polls_archive.create_index([("creator_id", ASCENDING)])
+    await db.achievements.create_index([("user_id", ASCENDING), ("earned_at", DESCENDING)])
+    await db.achievements.create_index([("user_id", ASCENDING), ("title", ASCENDING)])
+    await db.jobs.create_index([("id", ASCENDING)], unique=True)
+    await db.jobs.create_index([("status", ASCENDING), ("run_after", ASCENDING)])
+    await ensure_ttl_index(db.jobs, "finished_at", JOB_RETENTION_SECONDS)
+
+async def ensure_ttl_index(collection, field: str, seconds: int):
+    """Create a TTL index, or change the expiry of the existing one in place.
+
+    create_index refuses to change expireAfterSeconds on an existing index
+    (IndexOptionsConflict), which would stop every worker from starting
+    after the retention setting changes.
+    """
+    existing = (await collection.index_information()).get(f"{field}_1")
+    if existing is not None and existing.get("expireAfterSeconds") != seconds:
+        await db.command({
+            "collMod": collection.name,
+            "index": {"keyPattern": {field: 1}, "expireAfterSeconds": seconds},
+        })
+    elif existing is None:
+        await collection.create_index([(field, ASCENDING)], expireAfterSeconds=seconds)
+
+async def warm_up_pool():
+    """Open minPoolSize connections up front so the first burst doesn't pay for the handshakes"""
+    await client.admin.command("ping")
+    if MONGO_MIN_POOL_SIZE > 1:
+        # Concurrent pings force the pool to open one connection per ping
+        await asyncio.gather(*[client.admin.command("ping") for _ in range(MONGO_MIN_POOL_SIZE)])
+
+async def connect_db():
+    global client, db
+    if client is None:
+        client = create_mongo_client()
+        db = client[db_name]
+    if MONGO_WARMUP_POOL:
+        await warm_up_pool()
+    if MONGO_ENSURE_INDEXES:
+        await ensure_indexes()
+
+def close_db():
+    global client, db
+    if client is not None:
+        client.close()
+    client = None
+    db = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await connect_db()
+    invalidation_bus.start()
+    job_queue.start()
+    logger.info("MongoDB client ready (maxPoolSize=%s, minPoolSize=%s, readPreference=%s)",
+                MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_READ_PREFERENCE)
+    archiver = asyncio.create_task(run_archiver()) if ARCHIVE_INTERVAL_SECONDS > 0 else None
+    try:
+        yield
+    finally:
+        if archiver is not None:
+            archiver.cancel()
+        await job_queue.stop()
+        invalidation_bus.stop()
+        close_db()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -71,6 +279,7 @@ class Poll(BaseModel):
     creator_username: str
     total_votes: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
     tags: List[str] = []
     is_active: bool = True
 
@@ -80,6 +289,12 @@ class PollCreate(BaseModel):
     options: List[str]
     tags: List[str] = []
 
+class PollChanges(BaseModel):
+    polls: List[Poll]
+    since: datetime
+    since_id: str = ""
+    has_more: bool = False
+
 class VoteRequest(BaseModel):
     poll_id: str
     option_id: str
@@ -94,6 +309,513 @@ class Achievement(BaseModel):
     earned_at: datetime = Field(default_factory=datetime.utcnow)
     xp_bonus: int = 0
 
+# Compact poll representation
+class CompactPoll:
+    """Slot-based poll held by the in-process caches.
+
+    Per-option counters live in one array and voters in a single
+    user id -> option index dict, with ids interned so a user who votes on
+    many cached polls is stored once. Well under half the memory of the
+    equivalent Poll model; see bench_compact_poll.py.
+    """
+
+    __slots__ = (
+        "id", "title", "description", "creator_id", "creator_username", "total_votes",
+        "created_at", "updated_at", "tags", "is_active", "option_ids", "option_texts",
+        "votes", "voters",
+    )
+
+    @classmethod
+    def from_doc(cls, data: dict) -> "CompactPoll":
+        poll = cls()
+        poll.id = sys.intern(data["id"])
+        poll.title = data["title"]
+        poll.description = data["description"]
+        poll.creator_id = sys.intern(data["creator_id"])
+        poll.creator_username = sys.intern(data["creator_username"])
+        poll.total_votes = data.get("total_votes", 0)
+        poll.created_at = data["created_at"]
+        poll.updated_at = data.get("updated_at", poll.created_at)
+        poll.tags = tuple(data.get("tags", ()))
+        poll.is_active = data.get("is_active", True)
+        options = data["options"]
+        poll.option_ids = tuple(sys.intern(option["id"]) for option in options)
+        poll.option_texts = tuple(option["text"] for option in options)
+        poll.votes = array("l", (option.get("votes", 0) for option in options))
+        poll.voters = {}
+        for index, option in enumerate(options):
+            for voter_id in option.get("voter_ids", ()):
+                poll.voters.setdefault(sys.intern(voter_id), index)
+        return poll
+
+    @classmethod
+    def from_poll(cls, poll: Poll) -> "CompactPoll":
+        return cls.from_doc(poll.dict())
+
+    def etag(self) -> str:
+        """Derived from the poll's own state, so every worker agrees on it"""
+        updated_at = self.updated_at.isoformat() if isinstance(self.updated_at, datetime) else self.updated_at
+        return f'"poll-{self.id}-{self.total_votes}-{updated_at}-{int(self.is_active)}"'
+
+    def to_dict(self) -> dict:
+        """Same shape as Poll.dict(), for responses and for writing back to Mongo"""
+        voter_ids = [[] for _ in self.option_ids]
+        for voter_id, index in self.voters.items():
+            voter_ids[index].append(voter_id)
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "options": [
+                {"id": option_id, "text": text, "votes": votes, "voter_ids": voters}
+                for option_id, text, votes, voters in zip(self.option_ids, self.option_texts, self.votes, voter_ids)
+            ],
+            "creator_id": self.creator_id,
+            "creator_username": self.creator_username,
+            "total_votes": self.total_votes,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "tags": list(self.tags),
+            "is_active": self.is_active,
+        }
+
+# In-process caches and cross-worker invalidation
+CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ENTRIES = env_int("CACHE_MAX_ENTRIES", 10000)
+# Set by run_workers.py; every worker binds a datagram socket in this directory
+INVALIDATION_DIR = os.environ.get("VOTELY_INVALIDATION_DIR")
+
+class LocalCache:
+    """Per-process TTL cache split into namespaces ("poll", "feed", "profile", "leaderboard").
+
+    Nothing is shared between workers: each worker fills its own cache and
+    relies on the invalidation bus to drop entries another worker made stale.
+    The TTL bounds staleness if an invalidation message is ever lost.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Dict[object, tuple]] = defaultdict(dict)
+        # Bumped on every invalidation of a namespace (local to this worker)
+        self._versions: Dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, namespace: str, key: object = None):
+        entry = self._entries[namespace].get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def version(self, namespace: str) -> int:
+        return self._versions[namespace]
+
+    def set(self, namespace: str, key: object, value, version: Optional[int] = None):
+        """Store value; pass the version() read before loading it to skip stale fills.
+
+        If the namespace was invalidated while the value was being loaded,
+        the value may predate that write, so it isn't cached.
+        """
+        if version is not None and version != self._versions[namespace]:
+            return
+        entries = self._entries[namespace]
+        if len(entries) >= self.max_entries:
+            # Drop the oldest insertion; dicts keep insertion order
+            entries.pop(next(iter(entries)))
+        entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, namespace: str, key: object = None):
+        """Drop one key, or the whole namespace when key is None"""
+        self.invalidations += 1
+        self._versions[namespace] += 1
+        if key is None:
+            self._entries.pop(namespace, None)
+        else:
+            self._entries[namespace].pop(key, None)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "ttl_seconds": self.ttl,
+            "entries": sum(len(entries) for entries in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+class InvalidationBus:
+    """Broadcasts cache invalidations to sibling workers over Unix datagram sockets.
+
+    Each worker binds ``<dir>/worker-<pid>.sock`` and publishing is a
+    ``sendto`` on every other socket in the directory, so there is no broker
+    process to keep alive. Disabled (local invalidation only) when no
+    directory is configured, i.e. when running a single worker.
+    """
+
+    def __init__(self, cache: LocalCache, directory: Optional[str]):
+        self.cache = cache
+        self.directory = Path(directory) if directory else None
+        self.path: Optional[Path] = None
+        self._sock: Optional[socket.socket] = None
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+
+    def start(self):
+        if self.directory is None or self._sock is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"worker-{os.getpid()}.sock"
+        if self.path.exists():
+            self.path.unlink()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._sock.bind(str(self.path))
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._on_readable)
+
+    def stop(self):
+        if self._sock is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+
+    def publish(self, namespace: str, key: object = None):
+        """Invalidate locally, then tell every other worker to do the same"""
+        self.cache.invalidate(namespace, key)
+        if self._sock is None:
+            return
+        message = json.dumps({"ns": namespace, "key": key}).encode()
+        for peer in self.directory.glob("worker-*.sock"):
+            if peer == self.path:
+                continue
+            try:
+                self._sock.sendto(message, str(peer))
+                self.sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker exited without cleaning up its socket
+                peer.unlink(missing_ok=True)
+            except BlockingIOError:
+                # Peer's receive buffer is full; its TTL will catch up
+                self.dropped += 1
+
+    def _on_readable(self):
+        while True:
+            try:
+                message = self._sock.recv(4096)
+            except BlockingIOError:
+                return
+            payload = json.loads(message)
+            self.received += 1
+            self.cache.invalidate(payload["ns"], payload["key"])
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "enabled": self._sock is not None,
+            "peers": len(list(self.directory.glob("worker-*.sock"))) - 1 if self._sock is not None else 0,
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.dropped,
+        }
+
+cache = LocalCache(CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES)
+invalidation_bus = InvalidationBus(cache, INVALIDATION_DIR)
+
+# Shared versions of the feed and leaderboard, stored in Mongo so every
+# worker derives the same ETag for the same data
+async def read_version(name: str) -> int:
+    version = await db.versions.find_one({"_id": name})
+    return version["v"] if version else 0
+
+async def bump_version(name: str):
+    await db.versions.update_one({"_id": name}, {"$inc": {"v": 1}}, upsert=True)
+
+async def bump_version_after_write(name: str):
+    # The write is already committed, so a failure here must not fail the
+    # request; clients may get a 304 for the old content until the next bump
+    try:
+        await bump_version(name)
+    except Exception:
+        logger.exception("Bumping the %s version failed", name)
+
+async def invalidate_poll(poll_id: str):
+    """Call after a poll write has been committed"""
+    await bump_version_after_write("feed")
+    invalidation_bus.publish("poll", poll_id)
+    invalidation_bus.publish("feed")
+
+async def invalidate_user(user_id: str):
+    """Call after a user write has been committed"""
+    await bump_version_after_write("leaderboard")
+    invalidation_bus.publish("profile", user_id)
+    invalidation_bus.publish("leaderboard")
+
+# Rate limiting
+RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+# Only enable behind a proxy that overwrites X-Forwarded-For, otherwise clients can spoof it
+RATE_LIMIT_TRUST_FORWARDED = env_bool("RATE_LIMIT_TRUST_FORWARDED", False)
+
+class RateLimit(NamedTuple):
+    capacity: int  # burst size
+    per_second: float  # refill rate
+
+    @classmethod
+    def per_minute(cls, count: int) -> Optional["RateLimit"]:
+        return cls(count, count / 60) if count > 0 else None
+
+class RateLimitRule(NamedTuple):
+    per_ip: Optional[RateLimit]
+    per_user: Optional[RateLimit]
+
+# Keyed by (method, path); limits are requests per minute, 0 disables a bucket.
+# Per-IP limits are loose since many users can share one address behind NAT.
+# Buckets live in each worker's memory (InMemoryTokenBucketStore), so with
+# run_workers.py --workers N a client can get up to N times these limits;
+# divide them by the worker count, or plug in a shared TokenBucketStore.
+RATE_LIMIT_RULES: Dict[Tuple[str, str], RateLimitRule] = {
+    ("POST", "/api/login"): RateLimitRule(
+        per_ip=RateLimit.per_minute(env_int("RATE_LIMIT_LOGIN_PER_IP", 30)),
+        per_user=None,
+    ),
+    ("POST", "/api/register"): RateLimitRule(
+        per_ip=RateLimit.per_minute(env_int("RATE_LIMIT_REGISTER_PER_IP", 30)),
+        per_user=None,
+    ),
+    ("POST", "/api/vote"): RateLimitRule(
+        per_ip=RateLimit.per_minute(env_int("RATE_LIMIT_VOTE_PER_IP", 120)),
+        per_user=RateLimit.per_minute(env_int("RATE_LIMIT_VOTE_PER_USER", 30)),
+    ),
+    ("POST", "/api/polls"): RateLimitRule(
+        per_ip=RateLimit.per_minute(env_int("RATE_LIMIT_POLLS_PER_IP", 30)),
+        per_user=RateLimit.per_minute(env_int("RATE_LIMIT_POLLS_PER_USER", 10)),
+    ),
+}
+
+class TokenBucketStore(ABC):
+    """Where bucket state lives. Subclass to share buckets between workers/hosts."""
+
+    @abstractmethod
+    async def take(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        """Consume one token; returns (allowed, seconds until a token is available)"""
+
+class InMemoryTokenBucketStore(TokenBucketStore):
+    """Buckets held in a plain dict in this process (limits are per worker)"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, List[float]] = {}
+
+    async def take(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._evict_idle(now)
+            bucket = self._buckets[key] = [float(limit.capacity), now]
+        else:
+            bucket[0] = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.per_second)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, 0.0
+        return False, (1 - bucket[0]) / limit.per_second
+
+    def _evict_idle(self, now: float):
+        # A bucket untouched for a minute has refilled completely for every
+        # configured limit, so forgetting it changes nothing
+        idle = [key for key, (_, last) in self._buckets.items() if now - last > 60]
+        for key in idle:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+class RateLimitMiddleware:
+    """ASGI middleware that sheds over-limit requests before they reach a route (and the DB).
+
+    Per-user buckets use the ``user_id`` query parameter or JSON body field,
+    which is how the write endpoints identify the acting user.
+    """
+
+    def __init__(self, app, rules: Dict[Tuple[str, str], RateLimitRule], store: TokenBucketStore):
+        self.app = app
+        self.rules = rules
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        rule = self.rules.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if rule is None or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        if rule.per_ip is not None:
+            allowed, retry_after = await self.store.take(f"ip:{scope['path']}:{client_ip(scope)}", rule.per_ip)
+            if not allowed:
+                await self._reject(scope, receive, send, retry_after)
+                return
+
+        if rule.per_user is not None:
+            user_id, receive = await extract_user_id(scope, receive)
+            if user_id:
+                allowed, retry_after = await self.store.take(f"user:{scope['path']}:{user_id}", rule.per_user)
+                if not allowed:
+                    await self._reject(scope, receive, send, retry_after)
+                    return
+
+        rate_limit_stats["allowed"] += 1
+        await self.app(scope, receive, send)
+
+    async def _reject(self, scope, receive, send, retry_after: float):
+        rate_limit_stats["limited"] += 1
+        response = JSONResponse(
+            {"detail": "Too many requests"},
+            status_code=429,
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+        await response(scope, receive, send)
+
+def client_ip(scope) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    peer = scope.get("client")
+    return peer[0] if peer else "unknown"
+
+async def extract_user_id(scope, receive):
+    """Find the acting user without touching the DB; returns a receive that replays the body"""
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if "user_id" in query:
+        return query["user_id"][0], receive
+
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    body = b"".join(chunks)
+
+    replayed = False
+    async def replay():
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        payload = None
+    user_id = payload.get("user_id") if isinstance(payload, dict) else None
+    return (user_id if isinstance(user_id, str) else None), replay
+
+rate_limit_store: TokenBucketStore = InMemoryTokenBucketStore()
+rate_limit_stats = {"allowed": 0, "limited": 0}
+
+# HTTP caching
+HTTP_CACHE_MAX_AGE = env_int("HTTP_CACHE_MAX_AGE", 0)
+HTTP_CACHE_S_MAXAGE = env_int("HTTP_CACHE_S_MAXAGE", 5)
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    # Sent as a weak validator: GZipMiddleware compresses the body after the
+    # tag is set, so the gzip and identity bodies share it and can't claim
+    # byte-for-byte equality
+    return {
+        "ETag": f"W/{etag}",
+        "Cache-Control": f"public, max-age={HTTP_CACHE_MAX_AGE}, s-maxage={HTTP_CACHE_S_MAXAGE}, must-revalidate",
+    }
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore a W/ prefix added by proxies
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def conditional_get(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Return a bare 304 if the client already has this version, else tag the response"""
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
+    return None
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def json_response(content, etag: Optional[str] = None) -> Response:
+    """Serialize plain dicts that already have the response model's shape.
+
+    Returning a Response skips FastAPI's response_model validation, which
+    would rebuild every cached poll into Poll/PollOption models per request.
+    """
+    body = json.dumps(content, default=json_default, ensure_ascii=False, separators=(",", ":"))
+    return Response(body, media_type="application/json", headers=cache_headers(etag) if etag else None)
+
+async def revalidate_version(request: Request, name: str) -> Optional[Response]:
+    """Return a bare 304 if the client holds the current shared version of `name`.
+
+    Costs one small read, so a cache miss can answer a revalidation
+    without querying or serializing the documents themselves.
+    """
+    if not request.headers.get("if-none-match"):
+        return None
+    etag = f'"{name}-{await read_version(name)}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
+
+# Request coalescing
+class SingleFlight:
+    """Runs at most one in-flight call per key; concurrent callers share its result.
+
+    The call runs in its own task, so a leader whose client disconnects
+    doesn't cancel the query for everyone else waiting on it.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[object, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: object, fn):
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+single_flight = SingleFlight()
+
 # Utility functions
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
@@ -109,13 +831,8 @@ async def get_user_by_id(user_id: str):
     user_data = await db.users.find_one({"id": user_id})
     return User(**user_data) if user_data else None
 
-async def calculate_poll_bonus_xp(poll_id: str) -> int:
+def calculate_poll_bonus_xp(total_votes: int) -> int:
     """Calculate bonus XP based on poll popularity"""
-    poll_data = await db.polls.find_one({"id": poll_id})
-    if not poll_data:
-        return 0
-    
-    total_votes = poll_data.get("total_votes", 0)
     if total_votes >= 100:
         return 100
     elif total_votes >= 50:
@@ -126,8 +843,28 @@ async def calculate_poll_bonus_xp(poll_id: str) -> int:
         return 10
     return 0
 
-async def award_achievement(user_id: str, achievement_type: str):
-    """Award achievement to user"""
+# How many applied job tokens each user document remembers; retries happen
+# within seconds, so only the most recent ones matter
+APPLIED_JOBS_KEPT = 50
+
+async def inc_user_once(user_id: str, token: str, inc: Dict[str, int]):
+    """Apply an $inc to a user exactly once per token.
+
+    The token is recorded on the user document in the same atomic update,
+    so a retried job can't apply it twice. Returns the updated user, or
+    None if the token was already applied (or the user doesn't exist).
+    """
+    user_data = await db.users.find_one_and_update(
+        {"id": user_id, "applied_jobs": {"$ne": token}},
+        {"$inc": inc, "$push": {"applied_jobs": {"$each": [token], "$slice": -APPLIED_JOBS_KEPT}}},
+        return_document=ReturnDocument.AFTER
+    )
+    if user_data:
+        await invalidate_user(user_id)
+    return user_data
+
+async def award_achievement(user_id: str, achievement_type: str, token: str):
+    """Award achievement to user (idempotent per token)"""
     user = await get_user_by_id(user_id)
     if not user:
         return
@@ -141,10 +878,14 @@ async def award_achievement(user_id: str, achievement_type: str):
     }
     
     if achievement_type in achievements:
-        # Check if user already has this achievement
-        existing = await db.achievements.find_one({"user_id": user_id, "title": achievements[achievement_type]["title"]})
+        token = f"{token}:{achievement_type}"
+        achievement_data = achievements[achievement_type]
+        # Check if user already has this achievement; if an earlier attempt
+        # of this same job inserted it, still make sure the XP was applied
+        existing = await db.achievements.find_one({"user_id": user_id, "title": achievement_data["title"]})
+        if existing and existing.get("awarded_by") != token:
+            return
         if not existing:
-            achievement_data = achievements[achievement_type]
             achievement = Achievement(
                 user_id=user_id,
                 title=achievement_data["title"],
@@ -152,13 +893,433 @@ async def award_achievement(user_id: str, achievement_type: str):
                 badge_icon=achievement_data["badge_icon"],
                 xp_bonus=achievement_data["xp_bonus"]
             )
-            await db.achievements.insert_one(achievement.dict())
-            
-            # Award bonus XP
-            await db.users.update_one(
-                {"id": user_id},
-                {"$inc": {"xp": achievement_data["xp_bonus"]}}
-            )
+            await db.achievements.insert_one({**achievement.dict(), "awarded_by": token})
+        
+        # Award bonus XP
+        await inc_user_once(user_id, token, {"xp": achievement_data["xp_bonus"]})
+
+# Background jobs
+JOB_CONCURRENCY = env_int("JOB_CONCURRENCY", 4)
+JOB_MAX_ATTEMPTS = env_int("JOB_MAX_ATTEMPTS", 5)
+# A claimed job whose worker died is picked up again after this long
+JOB_LEASE_SECONDS = env_int("JOB_LEASE_SECONDS", 60)
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get("JOB_POLL_INTERVAL_SECONDS", "1"))
+JOB_RETENTION_SECONDS = env_int("JOB_RETENTION_SECONDS", 86400)
+# Outbox entries the request path couldn't move into `jobs` are picked up
+# by a sweeper once they are this old
+JOB_OUTBOX_SWEEP_SECONDS = env_int("JOB_OUTBOX_SWEEP_SECONDS", 30)
+
+class JobQueue:
+    """Durable in-process queue for side effects that don't need to block a response.
+
+    A job is first written to the `pending_jobs` outbox of the document
+    whose write caused it, in that same update, so a recorded write can
+    never lose its job. enqueue() then copies it into the `jobs`
+    collection (keyed by job id, so copying twice is harmless) and pulls
+    it from the outbox; a sweeper retries anything left behind. Workers
+    claim jobs with an atomic find_one_and_update, which makes each
+    attempt run in exactly one worker even with several API processes.
+    Failed attempts are retried with exponential backoff. Handlers make
+    their writes idempotent per job id (see inc_user_once), so a retried
+    job never applies an effect twice.
+    """
+
+    def __init__(self, concurrency: int, max_attempts: int, lease_seconds: int, outboxes: List[str]):
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        # Collections whose documents carry a pending_jobs outbox
+        self.outboxes = outboxes
+        self.handlers = {}
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._workers: List[asyncio.Task] = []
+        self._sweeper: Optional[asyncio.Task] = None
+        # Created in start() so it belongs to the running app's event loop
+        self._wakeup: Optional[asyncio.Event] = None
+        self.enqueued = 0
+        self.swept = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.running = 0
+
+    def handler(self, kind: str):
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    @staticmethod
+    def new_job(kind: str, payload: dict) -> dict:
+        """Build an outbox entry to $push in the same update as the write that causes it"""
+        return {"id": str(uuid.uuid4()), "kind": kind, "payload": payload, "created_at": datetime.utcnow()}
+
+    async def enqueue(self, collection: str, doc_id: str, jobs: List[dict]) -> bool:
+        """Move jobs from a document's outbox into the queue.
+
+        Never raises: the jobs stay in the outbox and the sweeper retries
+        them. Returns whether every job was moved.
+        """
+        try:
+            for job in jobs:
+                result = await db.jobs.update_one(
+                    {"id": job["id"]},
+                    {"$setOnInsert": {
+                        "id": job["id"],
+                        "kind": job["kind"],
+                        "payload": job["payload"],
+                        "status": "pending",
+                        "attempts": 0,
+                        "run_after": datetime.utcnow(),
+                        "created_at": job["created_at"],
+                    }},
+                    upsert=True
+                )
+                if result.upserted_id is not None:
+                    self.enqueued += 1
+                await db[collection].update_one({"id": doc_id}, {"$pull": {"pending_jobs": {"id": job["id"]}}})
+        except Exception:
+            logger.exception("Moving jobs out of %s %s failed; the sweeper will retry", collection, doc_id)
+            return False
+        finally:
+            if self._wakeup is not None:
+                self._wakeup.set()
+        return True
+
+    async def sweep_outboxes(self) -> int:
+        """Enqueue outbox entries the request path left behind"""
+        cutoff = datetime.utcnow() - timedelta(seconds=JOB_OUTBOX_SWEEP_SECONDS)
+        moved = 0
+        for collection in self.outboxes:
+            query = {"pending_jobs.created_at": {"$lt": cutoff}}
+            async for doc in db[collection].find(query, {"id": 1, "pending_jobs": 1}):
+                if await self.enqueue(collection, doc["id"], doc["pending_jobs"]):
+                    moved += len(doc["pending_jobs"])
+        self.swept += moved
+        return moved
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(JOB_OUTBOX_SWEEP_SECONDS)
+            try:
+                moved = await self.sweep_outboxes()
+                if moved:
+                    logger.info("Swept %s jobs out of outboxes", moved)
+            except Exception:
+                logger.exception("Sweeping job outboxes failed")
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        # Interrupted jobs keep their lease and are re-run once it expires
+        tasks = self._workers + ([self._sweeper] if self._sweeper else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._sweeper = None
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await db.jobs.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "run_after": {"$lte": now}},
+                {"status": "running", "locked_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "locked_by": self.worker_id,
+                    "locked_until": now + timedelta(seconds=self.lease_seconds),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_after", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _work(self):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Claiming a job failed")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Most likely the status write failed; the job keeps its lease
+                # and is re-run (idempotently) once the lease expires
+                logger.exception("Recording the outcome of job %s failed", job["id"])
+
+    async def _run(self, job: dict):
+        self.running += 1
+        try:
+            await self.handlers[job["kind"]](job["id"], **job["payload"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            logger.exception("Job %s (%s) failed on attempt %s", job["id"], job["kind"], job["attempts"])
+            if job["attempts"] >= self.max_attempts:
+                self.failed += 1
+                update = {"status": "failed", "finished_at": datetime.utcnow(), "last_error": repr(error)}
+            else:
+                self.retried += 1
+                backoff = timedelta(seconds=2 ** job["attempts"])
+                update = {"status": "pending", "run_after": datetime.utcnow() + backoff, "last_error": repr(error)}
+            await db.jobs.update_one({"id": job["id"]}, {"$set": update})
+        else:
+            self.completed += 1
+            await db.jobs.update_one({"id": job["id"]}, {"$set": {"status": "done", "finished_at": datetime.utcnow()}})
+        finally:
+            self.running -= 1
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "workers": sum(not worker.done() for worker in self._workers),
+            "running": self.running,
+            "enqueued": self.enqueued,
+            "swept": self.swept,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+job_queue = JobQueue(JOB_CONCURRENCY, JOB_MAX_ATTEMPTS, JOB_LEASE_SECONDS, outboxes=["polls"])
+
+async def claim_milestone(poll_id: str, name: str, threshold: int, job_id: str) -> Optional[str]:
+    """Record that a poll reached a vote milestone, once per poll.
+
+    Returns the poll's creator_id to the job that claimed the milestone
+    (including retries of that job), and None to everyone else.
+    """
+    claim = {"name": name, "job": job_id}
+    poll_data = await db.polls.find_one_and_update(
+        {"id": poll_id, "total_votes": {"$gte": threshold}, "milestones.name": {"$ne": name}},
+        {"$push": {"milestones": claim}},
+        projection={"creator_id": 1}
+    )
+    if poll_data is None:
+        poll_data = await db.polls.find_one({"id": poll_id, "milestones": claim}, {"creator_id": 1})
+    return poll_data["creator_id"] if poll_data else None
+
+@job_queue.handler("poll_created")
+async def poll_created_side_effects(job_id: str, creator_id: str):
+    # Award XP for creating poll (20 XP)
+    user_data = await inc_user_once(creator_id, job_id, {"xp": 20, "total_polls_created": 1})
+    if user_data is None:
+        # Already counted by an earlier attempt; the exact count is gone, so
+        # fall back to thresholds (award_achievement skips existing ones)
+        user_data = await db.users.find_one({"id": creator_id})
+        if not user_data:
+            return
+        polls_created = user_data["total_polls_created"]
+        first_poll, prolific = polls_created >= 1, polls_created >= 10
+    else:
+        polls_created = user_data["total_polls_created"]
+        first_poll, prolific = polls_created == 1, polls_created == 10
+    
+    # Check for achievements
+    if first_poll:
+        await award_achievement(creator_id, "first_poll", job_id)
+    if prolific:
+        await award_achievement(creator_id, "prolific_creator", job_id)
+
+@job_queue.handler("vote_recorded")
+async def vote_side_effects(job_id: str, user_id: str, poll_id: str):
+    # Award XP for voting (5 XP)
+    user_data = await inc_user_once(user_id, job_id, {"xp": 5, "total_votes_cast": 1})
+    if user_data is None:
+        user_data = await db.users.find_one({"id": user_id})
+        vote_master = bool(user_data) and user_data["total_votes_cast"] >= 10
+    else:
+        vote_master = user_data["total_votes_cast"] == 10
+    
+    # Check achievements for voter
+    if vote_master:
+        await award_achievement(user_id, "vote_master", job_id)
+    
+    # Check for poll creator achievements based on vote milestones; the
+    # vote count isn't known when the job is written, so the first job to
+    # see a milestone reached claims it
+    creator_id = await claim_milestone(poll_id, "popular_creator", 50, job_id)
+    if creator_id:
+        await award_achievement(creator_id, "popular_creator", job_id)
+    creator_id = await claim_milestone(poll_id, "viral_creator", 100, job_id)
+    if creator_id:
+        await award_achievement(creator_id, "viral_creator", job_id)
+        # Award bonus XP to poll creator
+        await inc_user_once(creator_id, f"{job_id}:bonus", {"xp": calculate_poll_bonus_xp(100)})
+
+# Archival
+# Polls with no activity for this long (or explicitly deactivated) leave the hot collection
+ARCHIVE_AFTER_DAYS = env_int("ARCHIVE_AFTER_DAYS", 90)
+ARCHIVE_BATCH_SIZE = env_int("ARCHIVE_BATCH_SIZE", 500)
+# 0 disables the in-process job; run archive_polls.py from cron instead
+ARCHIVE_INTERVAL_SECONDS = env_int("ARCHIVE_INTERVAL_SECONDS", 0)
+
+def pack_poll(poll_data: dict) -> bytes:
+    poll_data = {key: value for key, value in poll_data.items() if key != "_id"}
+    return zlib.compress(json.dumps(poll_data, default=str, separators=(",", ":")).encode())
+
+def unpack_poll(payload: bytes) -> Poll:
+    # Archived polls no longer take votes, whatever they said when archived
+    return Poll(**{**json.loads(zlib.decompress(payload)), "is_active": False})
+
+async def get_archived_poll(poll_id: str) -> Optional[Poll]:
+    archived = await db.polls_archive.find_one({"id": poll_id}, {"data": 1})
+    return unpack_poll(archived["data"]) if archived else None
+
+async def archive_polls(older_than: Optional[datetime] = None) -> int:
+    """Move inactive or stale polls, with their voter lists, into polls_archive.
+
+    The archive keeps a small stub of queryable fields next to the
+    zlib-compressed document. A poll that changes while it is being
+    archived stays in the hot collection and is retried on the next run,
+    as does one whose job outbox hasn't been drained yet.
+    """
+    cutoff = older_than or datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    query = {
+        "$or": [
+            {"is_active": False},
+            {"updated_at": {"$lt": cutoff}},
+            # Polls written before updated_at existed
+            {"updated_at": {"$exists": False}, "created_at": {"$lt": cutoff}},
+        ],
+        "pending_jobs.0": {"$exists": False},
+    }
+    archived = 0
+    async for poll_data in db.polls.find(query).batch_size(ARCHIVE_BATCH_SIZE):
+        poll = Poll(**poll_data)
+        await db.polls_archive.replace_one(
+            {"id": poll.id},
+            {
+                "id": poll.id,
+                "title": poll.title,
+                "creator_id": poll.creator_id,
+                "creator_username": poll.creator_username,
+                "total_votes": poll.total_votes,
+                "created_at": poll.created_at,
+                "archived_at": datetime.utcnow(),
+                "data": pack_poll(poll_data),
+            },
+            upsert=True
+        )
+        # Only drop the hot copy if nobody voted while we were copying it
+        result = await db.polls.delete_one({"id": poll.id, "updated_at": poll_data.get("updated_at")})
+        if result.deleted_count:
+            archived += 1
+            await invalidate_poll(poll.id)
+        else:
+            await db.polls_archive.delete_one({"id": poll.id})
+    return archived
+
+async def run_archiver():
+    while True:
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+        try:
+            archived = await archive_polls()
+            if archived:
+                logger.info("Archived %s polls", archived)
+        except Exception:
+            logger.exception("Poll archival failed")
+
+# Exports
+EXPORT_BATCH_SIZE = env_int("EXPORT_BATCH_SIZE", 1000)
+# Responses are flushed in chunks of about this many bytes
+EXPORT_CHUNK_BYTES = env_int("EXPORT_CHUNK_BYTES", 64 * 1024)
+# The HTTP export endpoints are disabled unless a token is configured;
+# export_data.py talks to Mongo directly and doesn't need it
+EXPORT_TOKEN = os.environ.get("EXPORT_TOKEN")
+
+EXPORT_FIELDS = {
+    "polls": ["id", "title", "description", "options", "creator_id", "creator_username",
+              "total_votes", "created_at", "updated_at", "tags", "is_active", "archived"],
+    "votes": ["poll_id", "option_id", "user_id", "archived"],
+    "users": ["id", "username", "email", "xp", "total_polls_created", "total_votes_cast",
+              "created_at", "last_activity"],
+}
+
+async def iter_archived_polls() -> AsyncIterator[Poll]:
+    async for archived in db.polls_archive.find({}, {"data": 1}).batch_size(EXPORT_BATCH_SIZE):
+        yield unpack_poll(archived["data"])
+
+async def export_polls(include_archived: bool = False) -> AsyncIterator[dict]:
+    def row(poll: dict, archived: bool) -> dict:
+        # Voter lists are exported separately as votes
+        options = [{"id": option["id"], "text": option["text"], "votes": option.get("votes", 0)}
+                   for option in poll["options"]]
+        return {**{field: poll.get(field) for field in EXPORT_FIELDS["polls"]}, "options": options, "archived": archived}
+    
+    async for poll in db.polls.find({}, {"_id": 0, "options.voter_ids": 0}).batch_size(EXPORT_BATCH_SIZE):
+        yield row(poll, False)
+    if include_archived:
+        async for poll in iter_archived_polls():
+            yield row(poll.dict(), True)
+
+async def export_votes(include_archived: bool = False) -> AsyncIterator[dict]:
+    async for poll in db.polls.find({}, {"_id": 0, "id": 1, "options.id": 1, "options.voter_ids": 1}).batch_size(EXPORT_BATCH_SIZE):
+        for option in poll.get("options", []):
+            for user_id in option.get("voter_ids", []):
+                yield {"poll_id": poll["id"], "option_id": option["id"], "user_id": user_id, "archived": False}
+    if include_archived:
+        async for poll in iter_archived_polls():
+            for option in poll.options:
+                for user_id in option.voter_ids:
+                    yield {"poll_id": poll.id, "option_id": option.id, "user_id": user_id, "archived": True}
+
+async def export_users(include_archived: bool = False) -> AsyncIterator[dict]:
+    # Users are never archived; the flag is accepted for a uniform signature
+    projection = {"_id": 0, **{field: 1 for field in EXPORT_FIELDS["users"]}}
+    async for user in db.users.find({}, projection).batch_size(EXPORT_BATCH_SIZE):
+        yield {field: user.get(field) for field in EXPORT_FIELDS["users"]}
+
+EXPORTS = {
+    "polls": export_polls,
+    "votes": export_votes,
+    "users": export_users,
+}
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def encode_export(dataset: str, export_format: str, include_archived: bool = False) -> AsyncIterator[bytes]:
+    """Stream a dataset as NDJSON or CSV in ~EXPORT_CHUNK_BYTES chunks, holding one batch at a time"""
+    fields = EXPORT_FIELDS[dataset]
+    buffer = io.StringIO()
+    writer = None
+    if export_format == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=fields)
+        writer.writeheader()
+    async for row in EXPORTS[dataset](include_archived):
+        if writer is not None:
+            writer.writerow({
+                field: json.dumps(value) if isinstance(value, (list, dict)) else export_value(value)
+                for field, value in row.items()
+            })
+        else:
+            buffer.write(json.dumps(row, default=export_value, separators=(",", ":")))
+            buffer.write("\n")
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
 
 # API Routes
 @api_router.post("/register", response_model=UserProfile)
@@ -176,6 +1337,7 @@ async def register_user(user_data: UserCreate):
     )
     
     await db.users.insert_one(user.dict())
+    await invalidate_user(user.id)
     
     return UserProfile(
         id=user.id,
@@ -227,112 +1389,187 @@ async def create_poll(poll_data: PollCreate, user_id: str):
         tags=poll_data.tags
     )
     
-    await db.polls.insert_one(poll.dict())
-    
-    # Award XP for creating poll (20 XP)
-    await db.users.update_one(
-        {"id": user.id},
-        {"$inc": {"xp": 20, "total_polls_created": 1}}
-    )
-    
-    # Check for achievements
-    updated_user = await get_user_by_id(user.id)
-    if updated_user.total_polls_created == 1:
-        await award_achievement(user.id, "first_poll")
-    elif updated_user.total_polls_created == 10:
-        await award_achievement(user.id, "prolific_creator")
+    # XP and achievements are applied by the job queue; the job is stored
+    # with the poll so it can't be lost between two writes
+    job = job_queue.new_job("poll_created", {"creator_id": user.id})
+    await db.polls.insert_one({**poll.dict(), "pending_jobs": [job]})
+    await invalidate_poll(poll.id)
+    await job_queue.enqueue("polls", poll.id, [job])
     
     return poll
 
 @api_router.get("/polls", response_model=List[Poll])
-async def get_polls(limit: int = 20, skip: int = 0):
-    polls_data = await db.polls.find({"is_active": True}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    return [Poll(**poll) for poll in polls_data]
+async def get_polls(request: Request, limit: int = 20, skip: int = 0):
+    cached = cache.get("feed", (limit, skip))
+    if cached is None:
+        not_modified = await revalidate_version(request, "feed")
+        if not_modified:
+            return not_modified
+        version = cache.version("feed")
+        
+        async def load_feed():
+            feed_version = await read_version("feed")
+            polls_data = await db.polls.find({"is_active": True}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+            polls = [CompactPoll.from_doc(poll) for poll in polls_data]
+            if await read_version("feed") != feed_version:
+                # A write landed mid-read, so no version describes this page;
+                # serve it untagged and uncached
+                return None, polls
+            cache.set("feed", (limit, skip), (feed_version, polls), version)
+            return feed_version, polls
+        
+        # Requests arriving after an invalidation start a fresh flight
+        # instead of joining one that may have read pre-write data
+        cached = await single_flight.do(("feed", version, limit, skip), load_feed)
+    
+    feed_version, polls = cached
+    etag = f'"feed-{feed_version}"' if feed_version is not None else None
+    if etag is not None and etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return json_response([poll.to_dict() for poll in polls], etag)
 
-@api_router.get("/polls/{poll_id}", response_model=Poll)
-async def get_poll(poll_id: str):
-    poll_data = await db.polls.find_one({"id": poll_id})
-    if not poll_data:
-        raise HTTPException(status_code=404, detail="Poll not found")
-    return Poll(**poll_data)
+# updated_at comes from the app clock before the write commits, so a
+# change can land behind a cursor a client already holds. Cursors never
+# move past now minus this window; changes inside it are sent again.
+FEED_SYNC_OVERLAP_SECONDS = env_int("FEED_SYNC_OVERLAP_SECONDS", 5)
 
-@api_router.post("/vote")
-async def vote_on_poll(vote_data: VoteRequest):
-    # Get poll
-    poll_data = await db.polls.find_one({"id": vote_data.poll_id})
-    if not poll_data:
-        raise HTTPException(status_code=404, detail="Poll not found")
-    
-    poll = Poll(**poll_data)
-    
-    # Check if user already voted
-    user_already_voted = False
-    for option in poll.options:
-        if vote_data.user_id in option.voter_ids:
-            user_already_voted = True
-            break
-    
-    if user_already_voted:
-        raise HTTPException(status_code=400, detail="User has already voted on this poll")
+@api_router.get("/polls/changes", response_model=PollChanges)
+async def get_poll_changes(since: datetime, since_id: str = "", limit: int = 100):
+    """Polls changed after the (since, since_id) cursor, oldest change first.
     
-    # Find the option to vote for
-    option_found = False
-    for option in poll.options:
-        if option.id == vote_data.option_id:
-            option.votes += 1
-            option.voter_ids.append(vote_data.user_id)
-            option_found = True
-            break
+    Pass the returned `since`/`since_id` back on the next call; `has_more`
+    means the page was full and the client should ask again straight away.
+    Polls may be returned more than once, so clients merge them by id.
+    """
+    if since.tzinfo is not None:
+        # Stored timestamps are naive UTC (e.g. from Date.toISOString() with a Z)
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    query = {"$or": [
+        {"updated_at": {"$gt": since}},
+        {"updated_at": since, "id": {"$gt": since_id}},
+    ]}
+    polls_data = await db.polls.find(query).sort([("updated_at", 1), ("id", 1)]).limit(limit + 1).to_list(limit + 1)
+    polls = [Poll(**poll) for poll in polls_data[:limit]]
+    has_more = len(polls_data) > limit
     
-    if not option_found:
-        raise HTTPException(status_code=404, detail="Option not found")
+    cursor = (polls[-1].updated_at, polls[-1].id) if polls else (since, since_id)
+    if not has_more:
+        # Hold the cursor back by the overlap window (but never before
+        # where the client already was) to catch late-committing writes
+        floor = (datetime.utcnow() - timedelta(seconds=FEED_SYNC_OVERLAP_SECONDS), "")
+        cursor = max((since, since_id), min(cursor, floor))
+    return PollChanges(polls=polls, since=cursor[0], since_id=cursor[1], has_more=has_more)
+
+@api_router.get("/polls/{poll_id}", response_model=Poll)
+async def get_poll(poll_id: str, request: Request):
+    poll = cache.get("poll", poll_id)
+    if poll is None:
+        version = cache.version("poll")
+        
+        async def load_poll():
+            poll_data = await db.polls.find_one({"id": poll_id})
+            if poll_data:
+                poll = CompactPoll.from_doc(poll_data)
+            else:
+                archived = await get_archived_poll(poll_id)
+                if not archived:
+                    raise HTTPException(status_code=404, detail="Poll not found")
+                poll = CompactPoll.from_poll(archived)
+            cache.set("poll", poll_id, poll, version)
+            return poll
+        
+        poll = await single_flight.do(("poll", version, poll_id), load_poll)
     
-    # Update total votes
-    poll.total_votes += 1
+    etag = poll.etag()
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return json_response(poll.to_dict(), etag)
+
+@api_router.post("/vote")
+async def vote_on_poll(vote_data: VoteRequest):
+    # Options never change after creation, so a cached copy is good enough
+    # to find the option's position
+    poll = cache.get("poll", vote_data.poll_id)
+    if poll is not None:
+        option_ids = poll.option_ids
+    else:
+        poll_data = await db.polls.find_one({"id": vote_data.poll_id}, {"_id": 0, "options.id": 1})
+        if not poll_data:
+            if await db.polls_archive.find_one({"id": vote_data.poll_id}, {"_id": 1}):
+                raise HTTPException(status_code=400, detail="Poll is closed")
+            raise HTTPException(status_code=404, detail="Poll not found")
+        option_ids = [option["id"] for option in poll_data["options"]]
     
-    # Update poll in database
-    await db.polls.update_one(
-        {"id": vote_data.poll_id},
-        {"$set": poll.dict()}
-    )
+    # Record the vote atomically; the filter rejects users who already voted.
+    # The XP/achievement job goes into the poll's outbox in the same update.
+    option_index = option_ids.index(vote_data.option_id) if vote_data.option_id in option_ids else None
+    job = job_queue.new_job("vote_recorded", {"user_id": vote_data.user_id, "poll_id": vote_data.poll_id})
+    result = None
+    if option_index is not None:
+        result = await db.polls.find_one_and_update(
+            {
+                "id": vote_data.poll_id,
+                f"options.{option_index}.id": vote_data.option_id,
+                "options.voter_ids": {"$ne": vote_data.user_id},
+            },
+            {
+                "$inc": {f"options.{option_index}.votes": 1, "total_votes": 1},
+                "$push": {f"options.{option_index}.voter_ids": vote_data.user_id, "pending_jobs": job},
+                "$set": {"updated_at": datetime.utcnow()},
+            },
+            projection={"total_votes": 1},
+            return_document=ReturnDocument.AFTER
+        )
     
-    # Award XP for voting (5 XP)
-    await db.users.update_one(
-        {"id": vote_data.user_id},
-        {"$inc": {"xp": 5, "total_votes_cast": 1}}
-    )
+    if result is None:
+        # Nothing matched; work out why (only on the error path)
+        if await db.polls.find_one({"id": vote_data.poll_id, "options.voter_ids": vote_data.user_id}, {"_id": 1}):
+            raise HTTPException(status_code=400, detail="User has already voted on this poll")
+        if option_index is None:
+            raise HTTPException(status_code=404, detail="Option not found")
+        if await db.polls_archive.find_one({"id": vote_data.poll_id}, {"_id": 1}):
+            raise HTTPException(status_code=400, detail="Poll is closed")
+        raise HTTPException(status_code=404, detail="Poll not found")
     
-    # Check achievements for voter
-    updated_user = await get_user_by_id(vote_data.user_id)
-    if updated_user.total_votes_cast == 10:
-        await award_achievement(vote_data.user_id, "vote_master")
+    await invalidate_poll(vote_data.poll_id)
+    await job_queue.enqueue("polls", vote_data.poll_id, [job])
     
-    # Check for poll creator achievements based on vote milestones
-    if poll.total_votes == 50:
-        await award_achievement(poll.creator_id, "popular_creator")
-    elif poll.total_votes == 100:
-        await award_achievement(poll.creator_id, "viral_creator")
-        # Award bonus XP to poll creator
-        bonus_xp = await calculate_poll_bonus_xp(vote_data.poll_id)
-        await db.users.update_one(
-            {"id": poll.creator_id},
-            {"$inc": {"xp": bonus_xp}}
-        )
-    
-    return {"message": "Vote recorded successfully", "total_votes": poll.total_votes}
+    return {"message": "Vote recorded successfully", "total_votes": result["total_votes"]}
 
 @api_router.get("/leaderboard", response_model=List[UserProfile])
-async def get_leaderboard(limit: int = 10):
-    users_data = await db.users.find().sort("xp", -1).limit(limit).to_list(limit)
-    return [UserProfile(
-        id=user["id"],
-        username=user["username"],
-        email=user["email"],
-        xp=user["xp"],
-        total_polls_created=user["total_polls_created"],
-        total_votes_cast=user["total_votes_cast"],
-        created_at=user["created_at"]
-    ) for user in users_data]
+async def get_leaderboard(request: Request, response: Response, limit: int = 10):
+    cached = cache.get("leaderboard", limit)
+    if cached is None:
+        not_modified = await revalidate_version(request, "leaderboard")
+        if not_modified:
+            return not_modified
+        version = cache.version("leaderboard")
+        
+        async def load_leaderboard():
+            leaderboard_version = await read_version("leaderboard")
+            users_data = await db.users.find().sort("xp", -1).limit(limit).to_list(limit)
+            leaderboard = [UserProfile(
+                id=user["id"],
+                username=user["username"],
+                email=user["email"],
+                xp=user["xp"],
+                total_polls_created=user["total_polls_created"],
+                total_votes_cast=user["total_votes_cast"],
+                created_at=user["created_at"]
+            ) for user in users_data]
+            if await read_version("leaderboard") != leaderboard_version:
+                return None, leaderboard
+            cache.set("leaderboard", limit, (leaderboard_version, leaderboard), version)
+            return leaderboard_version, leaderboard
+        
+        cached = await single_flight.do(("leaderboard", version, limit), load_leaderboard)
+    
+    leaderboard_version, leaderboard = cached
+    if leaderboard_version is not None:
+        not_modified = conditional_get(request, response, f'"leaderboard-{leaderboard_version}"')
+        if not_modified:
+            return not_modified
+    return leaderboard
 
 @api_router.get("/users/{user_id}/achievements", response_model=List[Achievement])
 async def get_user_achievements(user_id: str):
@@ -341,11 +1578,16 @@ async def get_user_achievements(user_id: str):
 
 @api_router.get("/users/{user_id}/profile", response_model=UserProfile)
 async def get_user_profile(user_id: str):
+    profile = cache.get("profile", user_id)
+    if profile is not None:
+        return profile
+    
+    version = cache.version("profile")
     user = await get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return UserProfile(
+    profile = UserProfile(
         id=user.id,
         username=user.username,
         email=user.email,
@@ -354,10 +1596,51 @@ async def get_user_profile(user_id: str):
         total_votes_cast=user.total_votes_cast,
         created_at=user.created_at
     )
+    cache.set("profile", user_id, profile, version)
+    return profile
+
+@api_router.get("/export/{dataset}")
+async def export_dataset(
+    dataset: Literal["polls", "votes", "users"],
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    include_archived: bool = False,
+    x_export_token: Optional[str] = Header(None)
+):
+    if not EXPORT_TOKEN:
+        raise HTTPException(status_code=403, detail="Exports are disabled")
+    # Constant-time comparison so the token can't be guessed byte by byte from timings
+    if not hmac.compare_digest((x_export_token or "").encode(), EXPORT_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid export token")
+    
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    extension = "csv" if export_format == "csv" else "ndjson"
+    return StreamingResponse(
+        encode_export(dataset, export_format, include_archived),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{extension}"'}
+    )
+
+@api_router.get("/metrics")
+async def get_metrics():
+    return {
+        "worker_pid": os.getpid(),
+        "db_pool": pool_metrics.snapshot(),
+        "cache": cache.snapshot(),
+        "invalidation_bus": invalidation_bus.snapshot(),
+        "single_flight": single_flight.snapshot(),
+        "jobs": job_queue.snapshot(),
+        "rate_limit": {
+            **rate_limit_stats,
+            "tracked_keys": len(rate_limit_store) if hasattr(rate_limit_store, "__len__") else None,
+        },
+    }
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(GZipMiddleware, minimum_size=env_int("GZIP_MINIMUM_SIZE", 1000))
+app.add_middleware(RateLimitMiddleware, rules=RATE_LIMIT_RULES, store=rate_limit_store)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -372,7 +1655,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
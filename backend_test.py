@@ -15,6 +15,9 @@ with open('/app/frontend/.env', 'r') as f:
 API_URL = f"{BACKEND_URL}/api"
 print(f"Testing API at: {API_URL}")
 
+# Vote and poll side effects (XP, achievements) run asynchronously after the response
+JOB_SETTLE_SECONDS = 1
+
 # Test users
 test_users = []
 test_polls = []
@@ -358,6 +361,9 @@ def test_xp_for_poll_creation():
         print("Failed to create test poll")
         return False
     
+    # XP is applied by the background job queue, give it a moment
+    time.sleep(JOB_SETTLE_SECONDS)
+    
     # Check user profile for updated XP
     updated_profile = test_get_user_profile(user_id)
     if not updated_profile:
@@ -406,6 +412,9 @@ def test_xp_for_voting():
         print("Failed to vote on poll")
         return False
     
+    # XP is applied by the background job queue, give it a moment
+    time.sleep(JOB_SETTLE_SECONDS)
+    
     # Check user profile for updated XP
     updated_profile = test_get_user_profile(user_id)
     if not updated_profile:
@@ -438,6 +447,9 @@ def test_first_poll_achievement():
         print("Failed to create test poll")
         return False
     
+    # Achievements are awarded by the background job queue
+    time.sleep(JOB_SETTLE_SECONDS)
+    
     # Check achievements
     achievements = test_get_user_achievements(user_id)
     if not achievements:
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, createContext, useContext } from "react";
+import React, { useState, useEffect, useRef, createContext, useContext } from "react";
 import "./App.css";
 import axios from "axios";
 
@@ -296,7 +296,7 @@ const CreatePoll = ({ onPollCreated }) => {
 };
 
 // Poll Card Component
-const PollCard = ({ poll, onVote }) => {
+const PollCard = ({ poll, onVote, onMissing }) => {
   const [selectedOption, setSelectedOption] = useState('');
   const [voting, setVoting] = useState(false);
   const [hasVoted, setHasVoted] = useState(false);
@@ -325,6 +325,11 @@ const PollCard = ({ poll, onVote }) => {
       onVote();
     } catch (error) {
       console.error('Error voting:', error);
+      const response = error.response;
+      if (response && (response.status === 404 || (response.data && response.data.detail === 'Poll is closed'))) {
+        // Archived or removed polls never show up in the change feed
+        onMissing();
+      }
     } finally {
       setVoting(false);
     }
@@ -470,6 +475,9 @@ const Leaderboard = () => {
   );
 };
 
+// Polls per feed page; matches the API's default limit
+const FEED_PAGE_SIZE = 20;
+
 // Main Dashboard Component
 const Dashboard = () => {
   const [polls, setPolls] = useState([]);
@@ -477,6 +485,8 @@ const Dashboard = () => {
   const [showCreatePoll, setShowCreatePoll] = useState(false);
   const [activeTab, setActiveTab] = useState('polls');
   const { user, logout } = useAuth();
+  // Position in the change feed; later refreshes only ask for newer changes
+  const feedCursor = useRef(null);
 
   useEffect(() => {
     fetchPolls();
@@ -484,8 +494,13 @@ const Dashboard = () => {
 
   const fetchPolls = async () => {
     try {
-      const response = await axios.get(`${API}/polls`);
+      const response = await axios.get(`${API}/polls`, { params: { limit: FEED_PAGE_SIZE } });
       setPolls(response.data);
+      const latest = response.data.reduce((latest, poll) => {
+        const stamp = poll.updated_at || poll.created_at;
+        return !latest || stamp > latest ? stamp : latest;
+      }, null);
+      feedCursor.current = latest && { since: latest, since_id: '' };
     } catch (error) {
       console.error('Error fetching polls:', error);
     } finally {
@@ -493,13 +508,52 @@ const Dashboard = () => {
     }
   };
 
+  const syncPolls = async () => {
+    if (!feedCursor.current) {
+      return fetchPolls();
+    }
+    try {
+      let hasMore = true;
+      let closed = false;
+      while (hasMore) {
+        const response = await axios.get(`${API}/polls/changes`, { params: feedCursor.current });
+        const changed = response.data.polls;
+        feedCursor.current = { since: response.data.since, since_id: response.data.since_id };
+        hasMore = response.data.has_more;
+        closed = closed || changed.some((poll) => !poll.is_active);
+        setPolls((current) => {
+          const byId = new Map(current.map((poll) => [poll.id, poll]));
+          const newest = current.reduce(
+            (newest, poll) => (!newest || poll.created_at > newest ? poll.created_at : newest), null);
+          changed.forEach((poll) => {
+            // Only polls already on the page or created since it loaded;
+            // votes on older polls belong to pages that aren't shown
+            if (byId.has(poll.id) || !newest || poll.created_at > newest) {
+              byId.set(poll.id, poll);
+            }
+          });
+          return Array.from(byId.values())
+            .filter((poll) => poll.is_active)
+            .sort((a, b) => (a.created_at < b.created_at ? 1 : -1))
+            .slice(0, FEED_PAGE_SIZE);
+        });
+      }
+      if (closed) {
+        // Refill the page with the polls that now come after it
+        await fetchPolls();
+      }
+    } catch (error) {
+      console.error('Error syncing polls:', error);
+    }
+  };
+
   const handlePollCreated = () => {
     setShowCreatePoll(false);
-    fetchPolls();
+    syncPolls();
   };
 
   const handleVote = () => {
-    fetchPolls();
+    syncPolls();
   };
 
   return (
@@ -590,6 +644,7 @@ const Dashboard = () => {
                     key={poll.id} 
                     poll={poll} 
                     onVote={handleVote}
+                    onMissing={fetchPolls}
                   />
                 ))}
               </div>
@@ -0,0 +1,57 @@
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+# server.py reads these at import time; tests use mongomock instead
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "votely_test")
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory database plus fresh per-process caches"""
+    database = AsyncMongoMockClient()["votely_test"]
+    cache = server.LocalCache(server.CACHE_TTL_SECONDS, server.CACHE_MAX_ENTRIES)
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "cache", cache)
+    monkeypatch.setattr(server, "invalidation_bus", server.InvalidationBus(cache, None))
+    return database
+
+
+@pytest.fixture
+def api(db, monkeypatch):
+    """A client for the app without its lifespan (the db fixture stands in for connect_db)"""
+    monkeypatch.setattr(server, "RATE_LIMIT_ENABLED", False)
+    return TestClient(server.app)
+
+
+def make_poll_doc(voters_per_option=((), ())) -> dict:
+    options = [
+        {"id": f"option-{index}", "text": f"Option {index}", "votes": len(voters), "voter_ids": list(voters)}
+        for index, voters in enumerate(voters_per_option)
+    ]
+    return server.Poll(
+        title="Lunch?",
+        description="Where to eat",
+        options=options,
+        creator_id="creator",
+        creator_username="alice",
+        total_votes=sum(len(voters) for voters in voters_per_option),
+        tags=["food"],
+        # Mongo keeps milliseconds only
+        created_at=datetime(2024, 1, 1, 12, 0),
+        updated_at=datetime(2024, 1, 1, 12, 30),
+    ).dict()
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import server
+from tests.conftest import make_poll_doc
+
+CUTOFF = datetime(2024, 6, 1)
+
+
+async def insert_polls(db) -> dict:
+    polls = {
+        "stale": make_poll_doc([("u1",), ()]),
+        "closed": {**make_poll_doc(), "is_active": False, "updated_at": datetime(2024, 7, 1)},
+        "recent": {**make_poll_doc(), "updated_at": datetime(2024, 7, 1)},
+        "draining": {**make_poll_doc(), "pending_jobs": [{"id": "job", "kind": "vote_recorded"}]},
+    }
+    for doc in polls.values():
+        await db.polls.insert_one(dict(doc))
+    return polls
+
+
+@pytest.mark.anyio
+async def test_archives_stale_and_closed_polls_only(db):
+    polls = await insert_polls(db)
+
+    assert await server.archive_polls(older_than=CUTOFF) == 2
+
+    hot = {doc["id"] async for doc in db.polls.find({}, {"id": 1})}
+    assert hot == {polls["recent"]["id"], polls["draining"]["id"]}
+    archived = await db.polls_archive.find_one({"id": polls["stale"]["id"]})
+    assert (archived["title"], archived["creator_id"], archived["total_votes"]) == ("Lunch?", "creator", 1)
+    # Running again finds nothing new
+    assert await server.archive_polls(older_than=CUTOFF) == 0
+
+
+@pytest.mark.anyio
+async def test_archived_copy_keeps_voters_but_reads_as_inactive(db):
+    polls = await insert_polls(db)
+    await server.archive_polls(older_than=CUTOFF)
+
+    poll = await server.get_archived_poll(polls["stale"]["id"])
+
+    assert poll.options[0].voter_ids == ["u1"]
+    assert poll.is_active is False
+    assert await server.get_archived_poll("missing") is None
+
+
+def test_get_poll_serves_archived_polls_as_inactive(api, db):
+    polls = asyncio.run(insert_polls(db))
+    asyncio.run(server.archive_polls(older_than=CUTOFF))
+
+    response = api.get(f"/api/polls/{polls['stale']['id']}")
+
+    assert response.status_code == 200
+    assert response.json()["is_active"] is False
+    assert response.json()["options"][0]["votes"] == 1
+    assert api.get("/api/polls/missing").status_code == 404
+
+
+def test_votes_on_archived_polls_are_rejected(api, db):
+    polls = asyncio.run(insert_polls(db))
+    asyncio.run(server.archive_polls(older_than=CUTOFF))
+
+    response = api.post("/api/vote", json={"poll_id": polls["stale"]["id"], "option_id": "option-1", "user_id": "u2"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Poll is closed"
@@ -0,0 +1,123 @@
+import asyncio
+import socket
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+async def buses(tmp_path):
+    """Two workers' caches and buses sharing one socket directory"""
+    workers = []
+    for pid in (101, 102):
+        cache = server.LocalCache(ttl=30, max_entries=10)
+        bus = server.InvalidationBus(cache, str(tmp_path))
+        workers.append((pid, cache, bus))
+    yield workers
+    for _, _, bus in workers:
+        bus.stop()
+
+
+def start(monkeypatch, workers):
+    for pid, _, bus in workers:
+        monkeypatch.setattr(server.os, "getpid", lambda pid=pid: pid)
+        bus.start()
+
+
+async def wait_for(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition never became true")
+
+
+def test_local_cache_expires_entries(monkeypatch):
+    cache = server.LocalCache(ttl=30, max_entries=10)
+    now = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: now[0])
+    cache.set("poll", "a", 1)
+
+    assert cache.get("poll", "a") == 1
+    now[0] += 31
+    assert cache.get("poll", "a") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_local_cache_skips_fills_that_raced_an_invalidation():
+    cache = server.LocalCache(ttl=30, max_entries=10)
+    version = cache.version("feed")
+    cache.invalidate("feed")
+
+    cache.set("feed", "page", "stale", version=version)
+    assert cache.get("feed", "page") is None
+
+    cache.set("feed", "page", "fresh", version=cache.version("feed"))
+    assert cache.get("feed", "page") == "fresh"
+
+
+def test_local_cache_invalidates_one_key_or_a_namespace_and_evicts_oldest():
+    cache = server.LocalCache(ttl=30, max_entries=2)
+    cache.set("poll", "a", 1)
+    cache.set("poll", "b", 2)
+    cache.set("poll", "c", 3)
+    assert cache.get("poll", "a") is None
+
+    cache.invalidate("poll", "b")
+    assert (cache.get("poll", "b"), cache.get("poll", "c")) == (None, 3)
+    cache.invalidate("poll")
+    assert cache.get("poll", "c") is None
+
+
+@pytest.mark.anyio
+async def test_bus_invalidates_other_workers_caches(buses, monkeypatch):
+    (_, cache_a, bus_a), (_, cache_b, bus_b) = buses
+    start(monkeypatch, buses)
+    cache_b.set("poll", "p1", "stale")
+    cache_b.set("poll", "p2", "kept")
+    cache_b.set("feed", "page", "stale")
+
+    bus_a.publish("poll", "p1")
+    bus_a.publish("feed")
+    await wait_for(lambda: bus_b.received == 2)
+
+    assert cache_b.get("poll", "p1") is None
+    assert cache_b.get("poll", "p2") == "kept"
+    assert cache_b.get("feed", "page") is None
+    assert bus_a.snapshot()["peers"] == 1
+
+
+@pytest.mark.anyio
+async def test_bus_removes_sockets_of_dead_workers(buses, monkeypatch, tmp_path):
+    (_, _, bus_a), _ = buses
+    start(monkeypatch, buses[:1])
+    dead = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    dead.bind(str(tmp_path / "worker-999.sock"))
+    dead.close()
+
+    bus_a.publish("feed")
+
+    assert not (tmp_path / "worker-999.sock").exists()
+
+
+@pytest.mark.anyio
+async def test_bus_stop_removes_its_socket(buses, monkeypatch, tmp_path):
+    start(monkeypatch, buses)
+    (_, _, bus_a), _ = buses
+
+    bus_a.stop()
+
+    assert [path.name for path in tmp_path.iterdir()] == ["worker-102.sock"]
+
+
+def test_bus_without_directory_only_invalidates_locally():
+    cache = server.LocalCache(ttl=30, max_entries=10)
+    bus = server.InvalidationBus(cache, None)
+    bus.start()
+    cache.set("poll", "p1", "stale")
+
+    bus.publish("poll", "p1")
+
+    assert cache.get("poll", "p1") is None
+    assert bus.snapshot()["enabled"] is False
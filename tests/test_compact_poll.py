@@ -0,0 +1,48 @@
+import asyncio
+
+import server
+from tests.conftest import make_poll_doc
+
+
+def test_round_trips_through_to_dict():
+    doc = make_poll_doc([("u1", "u2"), ("u3",)])
+
+    assert server.CompactPoll.from_doc(doc).to_dict() == doc
+    assert server.Poll(**server.CompactPoll.from_doc(doc).to_dict()) == server.Poll(**doc)
+
+
+def test_from_poll_matches_from_doc():
+    doc = make_poll_doc([("u1",), ()])
+
+    assert server.CompactPoll.from_poll(server.Poll(**doc)).to_dict() == doc
+
+
+def test_ignores_extra_document_fields():
+    doc = make_poll_doc([("u1",), ()])
+
+    compact = server.CompactPoll.from_doc({**doc, "_id": "object-id", "pending_jobs": [], "milestones": []})
+
+    assert compact.to_dict() == doc
+
+
+def test_voters_are_interned_across_polls():
+    first = server.CompactPoll.from_doc(make_poll_doc([("".join(["user", "-1"]),), ()]))
+    second = server.CompactPoll.from_doc(make_poll_doc([("".join(["user", "-1"]),), ()]))
+
+    assert next(iter(first.voters)) is next(iter(second.voters))
+
+
+def test_feed_and_poll_responses_match_the_poll_model(api, db):
+    doc = make_poll_doc([("u1", "u2"), ("u3",)])
+    doc["created_at"] = doc["created_at"].replace(microsecond=123000)
+    asyncio.run(db.polls.insert_one(dict(doc)))
+    expected = server.Poll(**doc).model_dump(mode="json")
+
+    feed = api.get("/api/polls")
+    poll = api.get(f"/api/polls/{doc['id']}")
+
+    assert feed.headers["content-type"] == "application/json"
+    assert feed.json() == [expected]
+    assert poll.json() == expected
+    # Cache hits serialize the same way
+    assert api.get("/api/polls").json() == [expected]
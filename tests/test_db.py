@@ -0,0 +1,76 @@
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+@pytest.fixture
+def no_client(monkeypatch):
+    monkeypatch.setattr(server, "client", None)
+    monkeypatch.setattr(server, "db", None)
+    monkeypatch.setattr(server, "MONGO_WARMUP_POOL", False)
+    created = []
+
+    def create():
+        created.append(AsyncMongoMockClient())
+        return created[-1]
+
+    monkeypatch.setattr(server, "create_mongo_client", create)
+    return created
+
+
+def test_pool_metrics_track_open_and_checked_out_connections(monkeypatch):
+    monkeypatch.setattr(server, "MONGO_MAX_POOL_SIZE", 4)
+    metrics = server.PoolMetrics()
+    for _ in range(3):
+        metrics.connection_created(None)
+    metrics.connection_checked_out(None)
+    metrics.connection_checked_out(None)
+    metrics.connection_checked_in(None)
+    metrics.connection_closed(None)
+    metrics.connection_check_out_failed(None)
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot["open_connections"] == 2
+    assert snapshot["checked_out"] == 1
+    assert snapshot["idle"] == 1
+    assert snapshot["utilization"] == 0.25
+    assert (snapshot["checkouts"], snapshot["checkout_failures"]) == (2, 1)
+
+
+def test_client_uses_configured_pool_settings(monkeypatch):
+    monkeypatch.setattr(server, "MONGO_MAX_POOL_SIZE", 7)
+    monkeypatch.setattr(server, "MONGO_MIN_POOL_SIZE", 2)
+    monkeypatch.setattr(server, "MONGO_MAX_IDLE_TIME_MS", 5000)
+    motor_client = server.create_mongo_client()
+    try:
+        pool_options = motor_client.delegate.options.pool_options
+        assert (pool_options.max_pool_size, pool_options.min_pool_size) == (7, 2)
+        assert pool_options.max_idle_time_seconds == 5
+        assert server.pool_metrics in motor_client.delegate.options.event_listeners
+    finally:
+        motor_client.close()
+
+
+@pytest.mark.anyio
+async def test_connect_db_creates_one_client_and_close_db_releases_it(no_client):
+    await server.connect_db()
+    first = server.client
+    await server.connect_db()
+
+    assert server.client is first
+    assert len(no_client) == 1
+    assert server.db.name == server.db_name
+    assert "id_1" in await server.db.polls.index_information()
+
+    server.close_db()
+    assert (server.client, server.db) == (None, None)
+
+
+def test_lifespan_connects_and_disconnects(no_client):
+    with TestClient(server.app) as api:
+        assert server.client is no_client[0]
+        assert "db_pool" in api.get("/api/metrics").json()
+    assert server.client is None
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+
+import pytest
+
+import server
+from tests.conftest import make_poll_doc
+
+pytestmark = pytest.mark.anyio
+
+
+async def read_export(dataset: str, export_format: str, include_archived: bool = False) -> str:
+    chunks = [chunk async for chunk in server.encode_export(dataset, export_format, include_archived)]
+    return b"".join(chunks).decode()
+
+
+@pytest.fixture
+async def polls(db):
+    live = make_poll_doc([("u1", "u2"), ("u3",)])
+    archived = make_poll_doc([("u4",), ()])
+    await db.polls.insert_one(dict(live))
+    await db.polls_archive.insert_one({"id": archived["id"], "data": server.pack_poll(archived)})
+    return live, archived
+
+
+async def test_ndjson_polls_export_one_object_per_line(polls):
+    live, archived = polls
+
+    rows = [json.loads(line) for line in (await read_export("polls", "ndjson", True)).splitlines()]
+
+    assert [(row["id"], row["archived"]) for row in rows] == [(live["id"], False), (archived["id"], True)]
+    assert list(rows[0]) == server.EXPORT_FIELDS["polls"]
+    assert rows[0]["options"] == [
+        {"id": "option-0", "text": "Option 0", "votes": 2},
+        {"id": "option-1", "text": "Option 1", "votes": 1},
+    ]
+    assert rows[0]["created_at"] == live["created_at"].isoformat()
+
+
+async def test_csv_votes_export_has_header_and_one_row_per_vote(polls):
+    live, _ = polls
+
+    rows = list(csv.DictReader(io.StringIO(await read_export("votes", "csv"))))
+
+    assert [(row["poll_id"], row["option_id"], row["user_id"], row["archived"]) for row in rows] == [
+        (live["id"], "option-0", "u1", "False"),
+        (live["id"], "option-0", "u2", "False"),
+        (live["id"], "option-1", "u3", "False"),
+    ]
+
+
+async def test_csv_encodes_nested_values_as_json(polls):
+    rows = list(csv.DictReader(io.StringIO(await read_export("polls", "csv"))))
+
+    assert len(rows) == 1
+    assert json.loads(rows[0]["tags"]) == ["food"]
+    assert json.loads(rows[0]["options"])[0]["votes"] == 2
+
+
+async def test_export_streams_in_chunks(polls, monkeypatch):
+    monkeypatch.setattr(server, "EXPORT_CHUNK_BYTES", 1)
+
+    chunks = [chunk async for chunk in server.encode_export("votes", "ndjson")]
+
+    assert len(chunks) == 3
+
+
+@pytest.fixture
+def export_api(api, monkeypatch):
+    monkeypatch.setattr(server, "EXPORT_TOKEN", "s3cret")
+    return api
+
+
+def test_endpoint_requires_the_export_token(export_api):
+    assert export_api.get("/api/export/polls").status_code == 401
+    assert export_api.get("/api/export/polls", headers={"X-Export-Token": "wrong"}).status_code == 401
+
+
+def test_endpoint_is_disabled_without_a_configured_token(api, monkeypatch):
+    monkeypatch.setattr(server, "EXPORT_TOKEN", None)
+    assert api.get("/api/export/polls", headers={"X-Export-Token": ""}).status_code == 403
+
+
+async def test_endpoint_streams_the_requested_format(export_api, polls):
+    headers = {"X-Export-Token": "s3cret"}
+
+    csv_response = export_api.get("/api/export/votes?format=csv", headers=headers)
+    ndjson_response = export_api.get("/api/export/votes", headers=headers)
+
+    assert csv_response.headers["content-type"].startswith("text/csv")
+    assert 'filename="votes.csv"' in csv_response.headers["content-disposition"]
+    assert csv_response.text.splitlines()[0] == "poll_id,option_id,user_id,archived"
+    assert ndjson_response.headers["content-type"] == "application/x-ndjson"
+    assert len(ndjson_response.text.splitlines()) == 3
+    assert export_api.get("/api/export/votes?format=xml", headers=headers).status_code == 422
@@ -0,0 +1,142 @@
+import asyncio
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+import server
+from tests.conftest import make_poll_doc
+
+
+def request_with(headers: dict) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def insert_poll(db) -> dict:
+    doc = make_poll_doc()
+    asyncio.run(db.polls.insert_one(dict(doc)))
+    return doc
+
+
+def vote(api, doc, user_id="voter"):
+    response = api.post("/api/vote", json={"poll_id": doc["id"], "option_id": "option-0", "user_id": user_id})
+    assert response.status_code == 200
+
+
+def test_etag_matches_weak_lists_and_wildcards():
+    assert server.etag_matches(request_with({"If-None-Match": '"a", W/"b"'}), '"b"')
+    assert server.etag_matches(request_with({"If-None-Match": "*"}), '"b"')
+    assert not server.etag_matches(request_with({"If-None-Match": '"a"'}), '"b"')
+    assert not server.etag_matches(request_with({}), '"b"')
+
+
+def test_conditional_get_tags_response_or_returns_304():
+    response = Response()
+    assert server.conditional_get(request_with({}), response, '"v1"') is None
+    assert response.headers["etag"] == 'W/"v1"'
+    assert "s-maxage" in response.headers["cache-control"]
+
+    not_modified = server.conditional_get(request_with({"If-None-Match": '"v1"'}), Response(), '"v1"')
+    assert not_modified.status_code == 304
+
+
+def test_poll_etag_follows_the_document_so_every_worker_agrees():
+    doc = make_poll_doc()
+    voted = {**doc, "total_votes": 1}
+
+    assert server.CompactPoll.from_doc(doc).etag() == server.CompactPoll.from_doc(dict(doc)).etag()
+    assert server.CompactPoll.from_doc(doc).etag() != server.CompactPoll.from_doc(voted).etag()
+
+
+def test_get_poll_revalidates_until_a_vote(api, db):
+    doc = insert_poll(db)
+    url = f"/api/polls/{doc['id']}"
+
+    etag = api.get(url).headers["etag"]
+    assert api.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    vote(api, doc)
+    after = api.get(url, headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.json()["total_votes"] == 1
+
+
+def test_feed_etag_survives_a_cold_cache_and_changes_after_a_write(api, db):
+    doc = insert_poll(db)
+
+    etag = api.get("/api/polls").headers["etag"]
+    # Another worker (or this one after its TTL) starts with an empty cache
+    server.cache.invalidate("feed")
+    assert api.get("/api/polls", headers={"If-None-Match": etag}).status_code == 304
+
+    vote(api, doc)
+    assert api.get("/api/polls", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_leaderboard_etag_changes_when_a_user_registers(api):
+    etag = api.get("/api/leaderboard").headers["etag"]
+    assert api.get("/api/leaderboard", headers={"If-None-Match": etag}).status_code == 304
+
+    user = {"username": "bob", "email": "bob@example.com", "password": "secret"}
+    assert api.post("/api/register", json=user).status_code == 200
+    assert api.get("/api/leaderboard", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_cold_cache_revalidation_does_not_load_the_page(api, db):
+    insert_poll(db)
+    feed_etag = api.get("/api/polls").headers["etag"]
+    leaderboard_etag = api.get("/api/leaderboard").headers["etag"]
+    server.cache.invalidate("feed")
+    server.cache.invalidate("leaderboard")
+    executions = server.single_flight.executions
+
+    assert api.get("/api/polls", headers={"If-None-Match": feed_etag}).status_code == 304
+    assert api.get("/api/leaderboard", headers={"If-None-Match": leaderboard_etag}).status_code == 304
+    assert server.single_flight.executions == executions
+
+
+class FailingVersions:
+    """Database proxy whose `versions` writes fail"""
+
+    def __init__(self, db):
+        self._db = db
+
+    def __getattr__(self, name):
+        if name == "versions":
+            raise RuntimeError("versions unavailable")
+        return getattr(self._db, name)
+
+    def __getitem__(self, name):
+        return self._db[name]
+
+
+def test_failed_version_bump_does_not_fail_a_recorded_vote(api, db, monkeypatch):
+    doc = insert_poll(db)
+    api.get(f"/api/polls/{doc['id']}")
+    monkeypatch.setattr(server, "db", FailingVersions(db))
+
+    vote(api, doc)
+
+    assert server.cache.get("poll", doc["id"]) is None
+    stored = asyncio.run(db.polls.find_one({"id": doc["id"]}))
+    assert stored["total_votes"] == 1
+    assert asyncio.run(db.jobs.count_documents({"kind": "vote_recorded"})) == 1
+
+
+def test_compressed_and_identity_responses_carry_a_weak_etag(api, db):
+    for _ in range(20):
+        insert_poll(db)
+
+    compressed = api.get("/api/polls", headers={"Accept-Encoding": "gzip"})
+    identity = api.get("/api/polls", headers={"Accept-Encoding": "identity"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in identity.headers
+    assert compressed.headers["etag"] == identity.headers["etag"]
+    assert compressed.headers["etag"].startswith('W/"feed-')
+    revalidated = api.get("/api/polls", headers={"If-None-Match": compressed.headers["etag"]})
+    assert revalidated.status_code == 304
@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import pytest
+
+import server
+from tests.conftest import make_poll_doc
+
+pytestmark = pytest.mark.anyio
+
+
+async def insert_user(db, user_id="voter", **fields):
+    user = server.User(id=user_id, username=user_id, email=f"{user_id}@example.com", password_hash="x", **fields)
+    await db.users.insert_one(user.dict())
+
+
+async def queue_job(queue, db, kind, payload):
+    job = queue.new_job(kind, payload)
+    await db.polls.insert_one({"id": "poll", "pending_jobs": [job]})
+    assert await queue.enqueue("polls", "poll", [job])
+    return job
+
+
+@pytest.fixture
+def queue():
+    return server.JobQueue(concurrency=1, max_attempts=2, lease_seconds=60, outboxes=["polls"])
+
+
+async def test_failed_job_is_retried_with_backoff_then_marked_failed(db, queue):
+    calls = []
+
+    @queue.handler("flaky")
+    async def flaky(job_id):
+        calls.append(job_id)
+        raise RuntimeError("boom")
+
+    job = await queue_job(queue, db, "flaky", {})
+
+    claimed = await queue._claim()
+    await queue._run(claimed)
+    stored = await db.jobs.find_one({"id": job["id"]})
+    assert stored["status"] == "pending"
+    assert stored["run_after"] > datetime.utcnow()
+    assert "boom" in stored["last_error"]
+    # Backing off, so nothing is claimable yet
+    assert await queue._claim() is None
+
+    await db.jobs.update_one({"id": job["id"]}, {"$set": {"run_after": datetime.utcnow()}})
+    await queue._run(await queue._claim())
+    stored = await db.jobs.find_one({"id": job["id"]})
+    assert stored["status"] == "failed"
+    assert stored["attempts"] == 2
+    assert calls == [job["id"], job["id"]]
+    assert (queue.retried, queue.failed, queue.completed) == (1, 1, 0)
+
+
+async def test_enqueue_moves_outbox_entries_once(db, queue):
+    job = await queue_job(queue, db, "noop", {})
+
+    # A second copy (e.g. from the sweeper) doesn't create a second job
+    assert await queue.enqueue("polls", "poll", [job])
+    assert await db.jobs.count_documents({"id": job["id"]}) == 1
+    assert (await db.polls.find_one({"id": "poll"}))["pending_jobs"] == []
+    assert queue.enqueued == 1
+
+
+async def test_inc_user_once_applies_each_token_once(db):
+    await insert_user(db)
+
+    first = await server.inc_user_once("voter", "job-1", {"xp": 5})
+    again = await server.inc_user_once("voter", "job-1", {"xp": 5})
+    other = await server.inc_user_once("voter", "job-2", {"xp": 5})
+
+    assert first["xp"] == 5
+    assert again is None
+    assert other["xp"] == 10
+
+
+async def test_rerunning_a_vote_job_does_not_award_twice(db):
+    await insert_user(db, total_votes_cast=9)
+    await insert_user(db, "creator")
+    poll = {**make_poll_doc(), "total_votes": 50}
+    await db.polls.insert_one(poll)
+
+    for _ in range(2):
+        await server.vote_side_effects("job-1", user_id="voter", poll_id=poll["id"])
+
+    voter = await db.users.find_one({"id": "voter"})
+    creator = await db.users.find_one({"id": "creator"})
+    # 5 for the vote, 20 for Vote Master; 50 for Popular Creator
+    assert (voter["xp"], voter["total_votes_cast"]) == (25, 10)
+    assert creator["xp"] == 50
+    assert await db.achievements.count_documents({}) == 2
+
+
+class RecordingCommands:
+    """Database proxy that records commands instead of running them"""
+
+    def __init__(self, db):
+        self._db = db
+        self.commands = []
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    async def command(self, command):
+        self.commands.append(command)
+
+
+async def test_retention_change_updates_the_ttl_index_in_place(db, monkeypatch):
+    await server.ensure_ttl_index(db.jobs, "finished_at", 60)
+    recorder = RecordingCommands(db)
+    monkeypatch.setattr(server, "db", recorder)
+
+    await server.ensure_ttl_index(db.jobs, "finished_at", 60)
+    assert recorder.commands == []
+
+    await server.ensure_ttl_index(db.jobs, "finished_at", 120)
+    assert recorder.commands == [{
+        "collMod": "jobs",
+        "index": {"keyPattern": {"finished_at": 1}, "expireAfterSeconds": 120},
+    }]
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import server
+from tests.conftest import make_poll_doc
+
+
+def insert_poll(db, poll_id: str, updated_at: datetime) -> dict:
+    doc = {**make_poll_doc(), "id": poll_id, "updated_at": updated_at}
+    asyncio.run(db.polls.insert_one(dict(doc)))
+    return doc
+
+
+def changes(api, **params) -> dict:
+    response = api.get("/api/polls/changes", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_accepts_timezone_aware_since(api, db):
+    insert_poll(db, "p1", datetime(2024, 1, 1, 12, 0))
+
+    utc = changes(api, since="2024-01-01T11:00:00Z")
+    offset = changes(api, since="2024-01-01T14:30:00+02:00")
+    naive = changes(api, since="2024-01-01T11:00:00")
+
+    assert [poll["id"] for poll in utc["polls"]] == ["p1"]
+    assert offset["polls"] == []
+    assert utc == naive
+
+
+def test_pages_through_polls_with_the_same_updated_at(api, db):
+    tie = datetime(2024, 1, 1, 12, 0)
+    for poll_id in ("p0", "p1", "p2"):
+        insert_poll(db, poll_id, tie)
+
+    first = changes(api, since="2024-01-01T00:00:00", limit=2)
+    second = changes(api, since=first["since"], since_id=first["since_id"], limit=2)
+
+    assert [poll["id"] for poll in first["polls"]] == ["p0", "p1"]
+    assert first["has_more"] is True
+    assert (first["since"], first["since_id"]) == ("2024-01-01T12:00:00", "p1")
+    assert [poll["id"] for poll in second["polls"]] == ["p2"]
+    assert second["has_more"] is False
+
+
+def test_overlap_window_catches_late_commits(api, db):
+    now = datetime.utcnow()
+    insert_poll(db, "early", now - timedelta(seconds=60))
+    insert_poll(db, "fast", now - timedelta(milliseconds=500))
+
+    first = changes(api, since=(now - timedelta(minutes=5)).isoformat())
+    # Written before "fast" but committed after the first sync
+    insert_poll(db, "slow", now - timedelta(seconds=1))
+    second = changes(api, since=first["since"], since_id=first["since_id"])
+
+    assert [poll["id"] for poll in first["polls"]] == ["early", "fast"]
+    # The cursor is held back by the overlap window instead of jumping to "fast"
+    assert datetime.fromisoformat(first["since"]) < now - timedelta(seconds=server.FEED_SYNC_OVERLAP_SECONDS - 1)
+    assert [poll["id"] for poll in second["polls"]] == ["slow", "fast"]
+
+
+def test_cursor_never_moves_backwards(api, db):
+    since = (datetime.utcnow() - timedelta(seconds=1)).isoformat()
+
+    result = changes(api, since=since, since_id="p9")
+
+    assert (result["polls"], result["since"], result["since_id"]) == ([], since, "p9")
@@ -0,0 +1,134 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(server.time, "monotonic", clock)
+    return clock
+
+
+def test_store_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        server.TokenBucketStore()
+
+
+async def test_take_allows_a_burst_then_reports_retry_after(clock):
+    store = server.InMemoryTokenBucketStore()
+    limit = server.RateLimit.per_minute(3)
+
+    assert [await store.take("ip:1", limit) for _ in range(3)] == [(True, 0.0)] * 3
+    allowed, retry_after = await store.take("ip:1", limit)
+
+    assert not allowed
+    assert retry_after == pytest.approx(20)
+    # Other keys have their own bucket
+    assert await store.take("ip:2", limit) == (True, 0.0)
+
+
+async def test_take_refills_over_time_up_to_capacity(clock):
+    store = server.InMemoryTokenBucketStore()
+    limit = server.RateLimit.per_minute(3)
+    for _ in range(3):
+        await store.take("ip:1", limit)
+
+    clock.now += 20
+    assert (await store.take("ip:1", limit))[0]
+    assert not (await store.take("ip:1", limit))[0]
+
+    clock.now += 3600
+    assert [(await store.take("ip:1", limit))[0] for _ in range(4)] == [True, True, True, False]
+
+
+async def test_take_evicts_idle_buckets_when_full(clock):
+    store = server.InMemoryTokenBucketStore(max_keys=2)
+    limit = server.RateLimit.per_minute(3)
+    await store.take("ip:1", limit)
+    clock.now += 61
+    await store.take("ip:2", limit)
+
+    await store.take("ip:3", limit)
+
+    assert len(store) == 2
+    assert "ip:1" not in store._buckets
+
+
+async def echo_body(scope, receive, send):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+@pytest.fixture
+def limited_client(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_ENABLED", True)
+    rules = {
+        ("POST", "/vote"): server.RateLimitRule(per_ip=server.RateLimit.per_minute(5),
+                                                per_user=server.RateLimit.per_minute(2)),
+    }
+    app = server.RateLimitMiddleware(echo_body, rules, server.InMemoryTokenBucketStore())
+    return TestClient(app)
+
+
+def test_middleware_limits_per_user_and_replays_the_body(limited_client):
+    body = {"poll_id": "p", "option_id": "o", "user_id": "alice"}
+
+    responses = [limited_client.post("/vote", json=body) for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    # The route still sees the body the middleware read to find the user
+    assert responses[0].json() == body
+    assert int(responses[2].headers["retry-after"]) >= 1
+    assert limited_client.post("/vote", json={**body, "user_id": "bob"}).status_code == 200
+
+
+def test_middleware_limits_per_ip_and_reads_user_from_query(limited_client):
+    statuses = [limited_client.post(f"/vote?user_id=user-{n}").status_code for n in range(6)]
+
+    assert statuses == [200] * 5 + [429]
+
+
+def test_middleware_ignores_unlisted_routes(limited_client):
+    assert all(limited_client.post("/polls", content=b"x").status_code == 200 for _ in range(10))
+
+
+async def test_extract_user_id_reads_chunked_bodies():
+    messages = [
+        {"type": "http.request", "body": b'{"user_id": ', "more_body": True},
+        {"type": "http.request", "body": b'"alice"}', "more_body": False},
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    user_id, replay = await server.extract_user_id({"query_string": b""}, receive)
+
+    assert user_id == "alice"
+    assert await replay() == {"type": "http.request", "body": b'{"user_id": "alice"}', "more_body": False}
+
+
+async def test_extract_user_id_ignores_non_json_bodies():
+    async def receive():
+        return {"type": "http.request", "body": b"not json", "more_body": False}
+
+    user_id, _ = await server.extract_user_id({"query_string": b""}, receive)
+
+    assert user_id is None
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_coalesces_concurrent_calls():
+    flight = server.SingleFlight()
+    release = asyncio.Event()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await release.wait()
+        return "result"
+
+    waiters = [asyncio.ensure_future(flight.do("key", load)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.snapshot() == {"calls": 5, "executions": 1, "coalesced": 4, "in_flight": 0}
+
+
+async def test_keeps_running_when_a_caller_is_cancelled():
+    flight = server.SingleFlight()
+    release = asyncio.Event()
+
+    async def load():
+        await release.wait()
+        return "result"
+
+    leader = asyncio.ensure_future(flight.do("key", load))
+    follower = asyncio.ensure_future(flight.do("key", load))
+    await asyncio.sleep(0)
+    leader.cancel()
+    release.set()
+
+    assert await follower == "result"
+
+
+async def test_errors_reach_every_caller_and_the_next_call_runs_again():
+    flight = server.SingleFlight()
+    release = asyncio.Event()
+
+    async def fail():
+        await release.wait()
+        raise RuntimeError("boom")
+
+    waiters = [asyncio.ensure_future(flight.do("key", fail)) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def succeed():
+        return "ok"
+
+    assert await flight.do("key", succeed) == "ok"
+    assert flight.executions == 2
+
+
+async def test_different_keys_run_separately():
+    flight = server.SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0)
+        return object()
+
+    first, second = await asyncio.gather(flight.do(("feed", 1), load), flight.do(("feed", 2), load))
+
+    assert first is not second